@@ -66,8 +66,11 @@ def api_cancel():
     job_id = request.form.get('job')
     if not job_id:
         return error('job missing in form parameters', status=400)
-    signal = request.form.get('signal', 'TERM') # TODO validate signal?
-    prevstate = launcher.cancel(project_id, job_id, signal)
+    signal = request.form.get('signal', 'TERM')
+    try:
+        prevstate = launcher.cancel(project_id, job_id, signal)
+    except ValueError as e:
+        return error(str(e), status=400)
     if not prevstate:
         return error('job not found', status=404)
     return { 'status': 'ok', 'prevstate': prevstate }
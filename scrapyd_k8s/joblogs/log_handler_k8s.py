@@ -1,7 +1,8 @@
 import os
 import threading
-import tempfile
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
 from kubernetes import client, watch
 from scrapyd_k8s.object_storage import LibcloudObjectStorage
@@ -16,34 +17,27 @@ class KubernetesJobLogHandler:
     - Observes Kubernetes pods for job-related events.
     - Streams logs from running pods, storing them locally.
     - Uploads completed job logs to object storage.
-    - Retrieves and concatenates log files as needed.
 
     Attributes
     ----------
-    DEFAULT_BLOCK_SIZE : int
-        Default size (in bytes) of blocks to read when retrieving lines from a file.
     config : object
         Configuration object containing settings for job logs and storage.
     watcher_threads : dict
         Dictionary to keep track of watcher threads for each pod.
+    last_log_timestamps : dict
+        Timestamp of the last log line written for each job, to resume streaming from.
     namespace : str
         Kubernetes namespace to watch pods in.
-    num_lines_to_check : int
-        Number of lines to check from the end of the existing log file to avoid duplicates.
     object_storage_provider : LibcloudObjectStorage
         Instance of the object storage provider for uploading logs.
+    upload_executor : ThreadPoolExecutor
+        Executor that uploads logs of completed jobs, so that pod events are not held up by uploads.
 
     Methods
     -------
     get_existing_log_filename(job_name):
         Retrieves an existing temporary log file path for a given job name.
 
-    get_last_n_lines(file_path, num_lines):
-        Efficiently retrieves the last `num_lines` lines from a file.
-
-    concatenate_and_delete_files(main_file_path, temp_file_path, block_size=6144):
-        Concatenates a temporary file to the main log file and deletes the temporary file.
-
     make_log_filename_for_job(job_name):
         Ensures a log file exists for a given job and returns its path.
 
@@ -52,11 +46,23 @@ class KubernetesJobLogHandler:
 
     handle_events(event):
         Processes Kubernetes pod events to start log streaming or upload logs when pods complete.
-    """
-    # The value was chosen to provide a balance between memory usage and the number of I/O operations
-    DEFAULT_BLOCK_SIZE = 6144
 
-    def __init__(self, config):
+    finish_job_logs(job_id, thread_name, attempt=1):
+        Uploads the log file of a completed job to object storage, and removes it locally.
+    """
+    # Buffer size (in bytes) for writing log files, so that not every log line needs a write
+    LOG_BUFFER_SIZE = 65536
+    # Time (in seconds) to wait for a log stream to finish writing when its pod has completed
+    STREAM_FINISH_TIMEOUT = 30
+    # Number of times to wait for a log stream to finish before leaving its log file for now
+    STREAM_FINISH_ATTEMPTS = 10
+    # Extra time (in seconds) to request logs for when resuming a stream, to allow for clock differences
+    # between scrapyd-k8s and the node; lines received twice are skipped by their timestamp
+    RESUME_MARGIN = 300
+    # Number of job logs that can be uploaded at the same time
+    UPLOAD_WORKERS = 4
+
+    def __init__(self, config, api_client=None):
         """
         Constructs all the necessary attributes for the KubernetesJobLogHandler object.
 
@@ -64,15 +70,22 @@ class KubernetesJobLogHandler:
         ----------
         config : object
             Configuration object containing settings for job logs and storage.
+        api_client : kubernetes.client.ApiClient, optional
+            API client to share connections with, by default a new one is created.
         """
         self.config = config
         self.watcher_threads = {}
+        self.last_log_timestamps = {}
         self.namespace = config.namespace()
-        self.num_lines_to_check = int(config.joblogs().get('num_lines_to_check', 0))
         self.logs_dir = self.config.joblogs().get('logs_dir').strip()
         if not self.logs_dir:
             raise ValueError("Configuration error: 'logs_dir' is missing in joblogs configuration section.")
         self.object_storage_provider = LibcloudObjectStorage(self.config)
+        # one client for all log streams, each stream gets its own connection from the pool
+        self._v1 = client.CoreV1Api(api_client)
+        self.upload_executor = ThreadPoolExecutor(max_workers=self.UPLOAD_WORKERS, thread_name_prefix='joblogs-upload')
+        self._finishing_jobs = set()
+        self._finishing_jobs_lock = threading.Lock()
 
     def get_existing_log_filename(self, job_id):
         """
@@ -93,85 +106,10 @@ class KubernetesJobLogHandler:
             return log_file_path
         return None
 
-    def get_last_n_lines(self, file_path, num_lines):
-        """
-        Efficiently retrieves the last `num_lines` lines from a file.
-
-        Parameters
-        ----------
-        file_path : str
-            Path to the file from which to read the last lines.
-        num_lines : int
-            Number of lines to retrieve from the end of the file.
-
-        Returns
-        -------
-        list of str
-            A list containing the last `num_lines` lines from the file.
-        """
-        try:
-            with open(file_path, 'rb') as f:
-                # Move to the end of the file
-                f.seek(0, os.SEEK_END)
-                file_size = f.tell()
-                block_size = self.DEFAULT_BLOCK_SIZE
-                data = b''
-                remaining_lines = num_lines
-                while remaining_lines > 0 and file_size > 0:
-                    if file_size - block_size > 0:
-                        f.seek(file_size - block_size)
-                        block_data = f.read(block_size)
-                    else:
-                        f.seek(0)
-                        block_data = f.read(file_size)
-                    file_size -= block_size
-                    data = block_data + data
-                    lines_found = data.count(b'\n')
-                    # If we've found enough lines, we can stop reading more blocks
-                    if lines_found >= remaining_lines:
-                        break
-
-                # Decode the data and split into lines
-                lines = data.decode('utf-8', errors='replace').splitlines()
-                # Return the last `num_lines`
-                result = lines[-num_lines:]
-                return result
-        except FileNotFoundError:
-            logger.warning(f"File not found: {file_path}")
-            return []
-
-    def concatenate_and_delete_files(self, main_file_path, temp_file_path, block_size=DEFAULT_BLOCK_SIZE):
-        """
-        Concatenates a temporary file to the main log file and deletes the temporary file.
-
-        Parameters
-        ----------
-        main_file_path : str
-            Path to the main log file.
-        temp_file_path : str
-            Path to the temporary log file to be concatenated.
-        block_size : int, optional
-            Size of blocks to read at a time (default is 6144 bytes).
-
-        Returns
-        -------
-        None
-        """
-        try:
-            with open(main_file_path, 'ab') as main_file, open(temp_file_path, 'rb') as temp_file:
-                while True:
-                    block_data = temp_file.read(block_size)
-                    if not block_data:
-                        break
-                    main_file.write(block_data)
-            os.remove(temp_file_path)
-            logger.debug(f"Concatenated '{temp_file_path}' into '{main_file_path}' and deleted temporary file.")
-        except (IOError, OSError) as e:
-            logger.error(f"Failed to concatenate and delete files for job: {e}")
-
     def make_log_filename_for_job(self, job_id):
         """
-            Creates a log file path for a job, using the job name as the file name or returns a path to an existing file.
+            Creates a log file path for a job, using the job name as the file name. The log file itself is
+            created when logs are written to it.
 
             Parameters
             ----------
@@ -183,20 +121,8 @@ class KubernetesJobLogHandler:
             str
                 Path to the temporary log file for the given job.
         """
-
-        if not os.path.isdir(self.logs_dir):
-            os.makedirs(self.logs_dir)
-
-        log_file_path = os.path.join(self.logs_dir, f"{job_id}.txt")
-        if os.path.exists(log_file_path):
-            return log_file_path
-
-        with open(log_file_path, 'w') as file:
-            pass
-
-        return log_file_path
-
-
+        os.makedirs(self.logs_dir, exist_ok=True)
+        return os.path.join(self.logs_dir, f"{job_id}.txt")
 
     def stream_logs(self, job_id, pod_name):
         """
@@ -214,45 +140,54 @@ class KubernetesJobLogHandler:
         -------
         None
         """
-        log_lines_counter = 0
-        v1 = client.CoreV1Api()
         w = watch.Watch()
         log_file_path = self.make_log_filename_for_job(job_id)
-        last_n_lines = self.get_last_n_lines(log_file_path, self.num_lines_to_check)
-        if len(last_n_lines) == 0:
-            logger.info(f"Log file '{log_file_path}' is empty or not found. Starting fresh logs for job '{job_id}'.")
+        resume_after, last_timestamp, kwargs = None, None, {}
 
         try:
-            with open(log_file_path, 'a') as log_file:
-                temp_dir = os.path.dirname(log_file_path)
-                with tempfile.NamedTemporaryFile(mode='w+', delete=False, dir=temp_dir,
-                                                 prefix=f"{job_id}_logs_tmp_", suffix=".txt") as temp_logs:
-                    temp_file_path = temp_logs.name
-                    for line in w.stream(
-                        v1.read_namespaced_pod_log,
-                        name=pod_name,
-                        namespace=self.namespace,
-                        follow=True,
-                        _preload_content=False
-                    ):
-                        temp_logs.write(line + "\n")
-                        temp_logs.flush()
-
-                        if log_lines_counter == len(last_n_lines):
-                            log_file.write(line + "\n")
-                            log_file.flush()
-                        elif line == last_n_lines[log_lines_counter]:
-                            log_lines_counter += 1
-                        else:
-                            log_lines_counter = 0
-
-                if len(last_n_lines) > log_lines_counter:
-                    self.concatenate_and_delete_files(log_file_path, temp_file_path)
-                else:
-                    os.remove(temp_file_path)
-                    logger.info(f"Removed temporary file '{temp_file_path}' after streaming logs for job '{job_id}'.")
+            with open(log_file_path, 'ab', buffering=self.LOG_BUFFER_SIZE) as log_file:
+                # The log file only contains the log of this pod, so when streaming is resumed (e.g. after
+                # a restart), its size is the number of bytes of the log that were already written.
+                offset = os.fstat(log_file.fileno()).st_size
+                if offset == 0:
+                    logger.info(f"Log file '{log_file_path}' is empty. Starting fresh logs for job '{job_id}'.")
+                elif job_id in self.last_log_timestamps:
+                    # When a previous stream was interrupted, only request the logs since then. The timestamp
+                    # comes from the node's clock, so a generous margin is requested. Duplicates are avoided by
+                    # skipping lines up to the last written timestamp below, not by the requested time.
+                    resume_after = self.last_log_timestamps[job_id]
+                    since = datetime.strptime(resume_after[:19], '%Y-%m-%dT%H:%M:%S').replace(tzinfo=timezone.utc)
+                    since_seconds = int((datetime.now(timezone.utc) - since).total_seconds()) + self.RESUME_MARGIN
+                    kwargs['since_seconds'] = max(1, since_seconds)
+                    offset = 0
+                for line in w.stream(
+                    self._v1.read_namespaced_pod_log,
+                    name=pod_name,
+                    namespace=self.namespace,
+                    follow=True,
+                    timestamps=True,
+                    _preload_content=False,
+                    **kwargs
+                ):
+                    timestamp, _, line = line.partition(' ')
+                    if resume_after is not None:
+                        if _sortable_timestamp(timestamp) <= resume_after:
+                            continue
+                        resume_after = None
+                    last_timestamp = timestamp
+                    data = (line + "\n").encode('utf-8')
+                    if offset > 0:
+                        # skip what was already written
+                        if len(data) <= offset:
+                            offset -= len(data)
+                            continue
+                        data, offset = data[offset:], 0
+                    log_file.write(data)
         except Exception as e:
             logger.exception(f"Error streaming logs for job '{job_id}': {e}")
+        finally:
+            if last_timestamp:
+                self.last_log_timestamps[job_id] = _sortable_timestamp(last_timestamp)
 
     def handle_events(self, event):
         """
@@ -269,7 +204,14 @@ class KubernetesJobLogHandler:
                 job_id = pod.metadata.labels.get("org.scrapy.job_id")
                 pod_name = pod.metadata.name
                 thread_name = f"{self.namespace}_{pod_name}"
-                if pod.status.phase == 'Running':
+                # a pod deleted while running (e.g. when cancelled) never reaches a final phase
+                if event['type'] == 'DELETED' or pod.status.phase in ['Succeeded', 'Failed']:
+                    with self._finishing_jobs_lock:
+                        if job_id in self._finishing_jobs:
+                            return
+                        self._finishing_jobs.add(job_id)
+                    self.upload_executor.submit(self.finish_job_logs, job_id, thread_name)
+                elif pod.status.phase == 'Running':
                     if (thread_name in self.watcher_threads
                             and self.watcher_threads[thread_name] is not None
                             and self.watcher_threads[thread_name].is_alive()):
@@ -280,22 +222,69 @@ class KubernetesJobLogHandler:
                             args=(job_id, pod_name,)
                         )
                         self.watcher_threads[thread_name].start()
-                elif pod.status.phase in ['Succeeded', 'Failed']:
-                    log_filename = self.get_existing_log_filename(job_id)
-                    if log_filename is not None and os.path.isfile(log_filename) and os.path.getsize(log_filename) > 0:
-                        if self.object_storage_provider.object_exists(job_id):
-                            logger.info(f"Log file for job '{job_id}' already exists in storage.")
-                            if os.path.exists(log_filename):
-                                os.remove(log_filename)
-                                logger.info(
-                                    f"Removed local log file '{log_filename}' since it already exists in storage.")
-                        else:
-                            self.object_storage_provider.upload_file(log_filename)
-                            os.remove(log_filename)
-                            logger.info(f"Removed local log file '{log_filename}' after successful upload.")
-                    else:
-                        logger.info(f"Logfile not found for job '{job_id}'")
             else:
-                logger.debug(f"Other pod event type '{event['type']}' for pod '{pod.metadata.name}' - Phase: '{pod.status.phase}'")
+                logger.debug("Other pod event type '%s' for pod '%s' - Phase: '%s'", event['type'], pod.metadata.name, pod.status.phase)
         except Exception as e:
             logger.exception(f"Error watching pods in namespace '{self.namespace}': {e}")
+
+    def finish_job_logs(self, job_id, thread_name, attempt=1):
+        """
+        Uploads the log file of a completed job to object storage, and removes it locally.
+
+        Parameters
+        ----------
+        job_id : str
+            ID of the Kubernetes job, which is also the name of the log file.
+        thread_name : str
+            Name of the thread streaming the logs of the job's pod.
+        attempt : int, optional
+            Number of times this has been tried, while the log stream was still writing.
+
+        Returns
+        -------
+        None
+        """
+        rescheduled = False
+        try:
+            # the log stream ends with the pod, make sure its log file is complete
+            watcher_thread = self.watcher_threads.get(thread_name)
+            if watcher_thread is not None:
+                watcher_thread.join(timeout=self.STREAM_FINISH_TIMEOUT)
+                if watcher_thread.is_alive():
+                    # the file is incomplete and still open, don't upload or remove it
+                    if attempt < self.STREAM_FINISH_ATTEMPTS:
+                        logger.warning(f"Log stream for job '{job_id}' is still writing, retrying upload later.")
+                        self.upload_executor.submit(self.finish_job_logs, job_id, thread_name, attempt + 1)
+                        rescheduled = True
+                    else:
+                        logger.warning(f"Log stream for job '{job_id}' did not finish, leaving its log file.")
+                    return
+                self.watcher_threads.pop(thread_name, None)
+            self.last_log_timestamps.pop(job_id, None)
+            log_filename = self.get_existing_log_filename(job_id)
+            if log_filename is not None and os.path.isfile(log_filename) and os.path.getsize(log_filename) > 0:
+                if self.object_storage_provider.object_exists(job_id):
+                    logger.info(f"Log file for job '{job_id}' already exists in storage.")
+                    if os.path.exists(log_filename):
+                        os.remove(log_filename)
+                        logger.info(
+                            f"Removed local log file '{log_filename}' since it already exists in storage.")
+                else:
+                    self.object_storage_provider.upload_file(log_filename)
+                    os.remove(log_filename)
+                    logger.info(f"Removed local log file '{log_filename}' after successful upload.")
+            else:
+                logger.info(f"Logfile not found for job '{job_id}'")
+        except Exception as e:
+            logger.exception(f"Error uploading logs for job '{job_id}': {e}")
+        finally:
+            if not rescheduled:
+                with self._finishing_jobs_lock:
+                    self._finishing_jobs.discard(job_id)
+
+
+def _sortable_timestamp(timestamp):
+    """Returns an RFC3339 log timestamp with a fixed-length fraction, so that timestamps compare as strings."""
+    # Kubernetes drops trailing zeros of the nanoseconds, e.g. 2024-08-30T13:45:30.12Z
+    base, _, fraction = timestamp.rstrip('Z').partition('.')
+    return base + '.' + fraction.ljust(9, '0') + 'Z'
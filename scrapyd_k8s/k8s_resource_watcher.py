@@ -9,34 +9,55 @@ logger = logging.getLogger(__name__)
 
 class ResourceWatcher:
     """
-    Watches Kubernetes pod events and notifies subscribers about relevant events.
+    Watches Kubernetes pod (or job) events and notifies subscribers about relevant events.
+
+    The watched objects are also kept in a local store, so they can be read without
+    querying the Kubernetes API.
 
     Attributes
     ----------
     namespace : str
-        Kubernetes namespace to watch pods in.
+        Kubernetes namespace to watch resources in.
+    label_selector : str or None
+        Label selector to limit the watched resources.
+    resource : str
+        Kind of resource to watch, either 'pod' or 'job'.
     subscribers : List[Callable]
         List of subscriber callback functions to notify on events.
     """
 
-    def __init__(self, namespace, config):
+    def __init__(self, namespace, config, label_selector=None, resource='pod', api_client=None):
         """
         Initializes the ResourceWatcher.
 
         Parameters
         ----------
         namespace : str
-            Kubernetes namespace to watch pods in.
+            Kubernetes namespace to watch resources in.
+        label_selector : str, optional
+            Label selector to limit the watched resources, so the API server filters out unrelated ones.
+        resource : str, optional
+            Kind of resource to watch, either 'pod' (default) or 'job'.
+        api_client : kubernetes.client.ApiClient, optional
+            API client to share connections with, by default a new one is created.
         """
+        if resource not in ('pod', 'job'):
+            raise ValueError(f"Unsupported resource to watch: '{resource}'")
         self.namespace = namespace
+        self.label_selector = label_selector
+        self.resource = resource
+        self.api_client = api_client
         self.backoff_time = int(config.scrapyd().get('backoff_time', 5))
         self.backoff_coefficient = int(config.scrapyd().get('backoff_coefficient', 2))
         self.subscribers: List[Callable] = []
+        self._lock = threading.Lock()
+        self._objects = {}
+        self._objects_lock = threading.Lock()
+        self._synced = threading.Event()
         self._stop_event = threading.Event()
-        self.watcher_thread = threading.Thread(target=self.watch_pods, daemon=True)
+        self.watcher_thread = threading.Thread(target=self.watch_resources, daemon=True)
         self.watcher_thread.start()
-        self._lock = threading.Lock()
-        logger.info(f"ResourceWatcher thread started for namespace '{self.namespace}'.")
+        logger.info(f"ResourceWatcher thread started for {self.resource}s in namespace '{self.namespace}'.")
 
     def subscribe(self, callback: Callable):
         """
@@ -82,16 +103,108 @@ class ResourceWatcher:
                 except Exception as e:
                     logger.exception(f"Error notifying subscriber {subscriber.__name__}: {e}")
 
-    def watch_pods(self):
+    def get_objects(self):
+        """
+        Returns the watched objects from the local store.
+
+        Returns
+        -------
+        list or None
+            The watched objects, or None when they have not been listed yet.
         """
-        Watches Kubernetes pod events and notifies subscribers.
+        if not self._synced.is_set():
+            return None
+        with self._objects_lock:
+            return list(self._objects.values())
+
+    def get_object(self, name):
+        """
+        Returns a watched object by name from the local store.
+
+        Parameters
+        ----------
+        name : str
+            Name of the Kubernetes object.
+
+        Returns
+        -------
+        object or None
+            The watched object, or None when it is unknown or objects have not been listed yet.
+        """
+        if not self._synced.is_set():
+            return None
+        with self._objects_lock:
+            return self._objects.get(name)
+
+    def add_object(self, obj):
+        """
+        Adds an object to the local store, when it is not known yet. This makes an object
+        created by this process available right away, before its watch event arrives.
+
+        Parameters
+        ----------
+        obj : object
+            The Kubernetes object as returned by the API.
+        """
+        with self._objects_lock:
+            # a watch event may already have brought a more recent version
+            self._objects.setdefault(obj.metadata.name, obj)
+
+    def remove_object(self, name):
+        """
+        Removes an object from the local store, e.g. after it was deleted by this process.
+
+        Parameters
+        ----------
+        name : str
+            Name of the Kubernetes object.
+        """
+        with self._objects_lock:
+            self._objects.pop(name, None)
+
+    def _resync(self, list_func, kwargs):
+        """
+        Lists all resources to (re)fill the local store, and notifies subscribers
+        of them as added, like a watch without resource version would.
+
+        Returns
+        -------
+        str
+            Resource version to start watching from.
+        """
+        r = list_func(**kwargs)
+        with self._objects_lock:
+            self._objects = {o.metadata.name: o for o in r.items if not self._is_being_deleted(o)}
+        self._synced.set()
+        logger.debug("Listed %d %ss in namespace '%s'.", len(r.items), self.resource, self.namespace)
+        for o in r.items:
+            self.notify_subscribers({'type': 'ADDED', 'object': o})
+        return r.metadata.resource_version
+
+    def _update_store(self, event_type, obj):
+        with self._objects_lock:
+            if event_type == 'DELETED' or self._is_being_deleted(obj):
+                self._objects.pop(obj.metadata.name, None)
+            else:
+                self._objects[obj.metadata.name] = obj
+
+    def _is_being_deleted(self, obj):
+        # jobs deleted with foreground propagation are only removed after their pods, don't list them meanwhile
+        return self.resource == 'job' and obj.metadata.deletion_timestamp is not None
+
+    def watch_resources(self):
+        """
+        Watches Kubernetes resource events, updates the local store and notifies subscribers.
         Runs in a separate thread.
         """
-        v1 = client.CoreV1Api()
+        if self.resource == 'job':
+            list_func = client.BatchV1Api(self.api_client).list_namespaced_job
+        else:
+            list_func = client.CoreV1Api(self.api_client).list_namespaced_pod
         w = watch.Watch()
         resource_version = None
 
-        logger.info(f"Started watching pods in namespace '{self.namespace}'.")
+        logger.info(f"Started watching {self.resource}s in namespace '{self.namespace}'.")
         backoff_time = self.backoff_time
         while not self._stop_event.is_set():
             try:
@@ -99,26 +212,32 @@ class ResourceWatcher:
                     'namespace': self.namespace,
                     'timeout_seconds': 0,
                 }
-                if resource_version:
-                    kwargs['resource_version'] = resource_version
+                if self.label_selector:
+                    kwargs['label_selector'] = self.label_selector
+                if not resource_version:
+                    # (re)fill the local store, and continue watching from there
+                    resource_version = self._resync(list_func, {k: v for k, v in kwargs.items() if k != 'timeout_seconds'})
+                kwargs['resource_version'] = resource_version
                 first_event = True
-                for event in w.stream(v1.list_namespaced_pod, **kwargs):
-                    logging.debug("Connected to the k8s API, received an event from k8s API")
+                for event in w.stream(list_func, **kwargs):
                     if first_event:
                         # Reset reconnection attempts and backoff time upon successful reconnection
-                        logging.debug("This is the first event in the stream in the established connection, setting reconnection attempts to default")
+                        logger.debug("Connected to the k8s API, this is the first event in the stream in the established connection, setting reconnection attempts to default")
                         backoff_time = self.backoff_time
                         first_event = False  # Ensure this only happens once per connection
-                    pod_name = event['object'].metadata.name
-                    resource_version = event['object'].metadata.resource_version
-                    event_type = event['type']
-                    logger.debug(f"Received event: {event_type} for pod: {pod_name}")
+                    metadata = event['object'].metadata
+                    resource_version = metadata.resource_version
+                    logger.debug("Received event: %s for %s: %s", event['type'], self.resource, metadata.name)
+                    self._update_store(event['type'], event['object'])
                     self.notify_subscribers(event)
             except (urllib3.exceptions.ProtocolError,
                     urllib3.exceptions.ReadTimeoutError,
                     urllib3.exceptions.ConnectionError) as e:
                 logger.exception(f"Encountered network error: {e}")
-                logger.info(f"Retrying to watch pods after {backoff_time} seconds...")
+                # events may be missed until watching again, so let readers use the API and relist
+                self._synced.clear()
+                resource_version = None
+                logger.info(f"Retrying to watch {self.resource}s after {backoff_time} seconds...")
                 time.sleep(backoff_time)
                 backoff_time = min(backoff_time*self.backoff_coefficient, 900)
             except client.ApiException as e:
@@ -129,7 +248,9 @@ class ResourceWatcher:
                     continue
                 else:
                     logger.exception(f"Encountered ApiException: {e}")
-                    logger.info(f"Retrying to watch pods after {backoff_time} seconds...")
+                    self._synced.clear()
+                    resource_version = None
+                    logger.info(f"Retrying to watch {self.resource}s after {backoff_time} seconds...")
                     time.sleep(backoff_time)
                     backoff_time = min(backoff_time*self.backoff_coefficient, 900)
             except StopIteration:
@@ -137,7 +258,9 @@ class ResourceWatcher:
                 continue
             except Exception as e:
                 logger.exception(f"Watcher encountered exception: {e}")
-                logger.info(f"Retrying to watch pods after {backoff_time} seconds...")
+                self._synced.clear()
+                resource_version = None
+                logger.info(f"Retrying to watch {self.resource}s after {backoff_time} seconds...")
                 time.sleep(backoff_time)
                 backoff_time = min(backoff_time*self.backoff_coefficient, 900)
 
@@ -148,4 +271,4 @@ class ResourceWatcher:
         """
         self._stop_event.set()
         self.watcher_thread.join()
-        logger.info(f"ResourceWatcher thread stopped for namespace '{self.namespace}'.")
+        logger.info(f"ResourceWatcher thread stopped for {self.resource}s in namespace '{self.namespace}'.")
@@ -1,9 +1,10 @@
 import logging
 import re
 import socket
+from signal import Signals
 
 import docker
-from ..utils import format_iso_date_string, native_stringify_dict
+from ..utils import format_iso_date_string, scrapy_crawl_args
 
 logger = logging.getLogger(__name__)
 
@@ -33,8 +34,6 @@ class Docker:
         return jobs
 
     def schedule(self, project, version, spider, job_id, settings, args):
-        _settings = [i for k, v in native_stringify_dict(settings, keys_only=False).items() for i in ['-s', f"{k}={v}"]]
-        _args = [i for k, v in native_stringify_dict(args, keys_only=False).items() for i in ['-a', f"{k}={v}"]]
         env = {
             'SCRAPY_PROJECT': project.id(),
             'SCRAPYD_SPIDER': spider,
@@ -43,7 +42,7 @@ class Docker:
         resources = project.resources(spider)
         c = self._docker.containers.run(
             image=project.repository() + ':' + version,
-            command=['scrapy', 'crawl', spider, *_args, *_settings],
+            command=scrapy_crawl_args(spider, args, settings),
             environment=env,
             labels={
                 self.LABEL_PROJECT: project.id(),
@@ -57,6 +56,9 @@ class Docker:
         )
 
     def cancel(self, project_id, job_id, signal):
+        if 'SIG' + str(signal) not in Signals.__members__:
+            raise ValueError('Unknown signal: ' + str(signal))
+
         c = self._get_container(project_id, job_id)
         if not c:
             return None
@@ -1,16 +1,20 @@
 import os
 import logging
+import threading
 
 import kubernetes
 import kubernetes.stream
 from signal import Signals
 
 from ..k8s_resource_watcher import ResourceWatcher
-from ..utils import format_datetime_object, native_stringify_dict
+from ..utils import format_datetime_object, scrapy_crawl_args
 from scrapyd_k8s.joblogs import KubernetesJobLogHandler
 
 logger = logging.getLogger(__name__)
 
+# signal names as accepted by the cancel API (without SIG prefix) to their number
+_SIGNAL_MAP = {name[3:]: s.value for name, s in Signals.__members__.items() if name.startswith('SIG')}
+
 class K8s:
 
     LABEL_PROJECT = 'org.scrapy.project'
@@ -20,19 +24,46 @@ class K8s:
     def __init__(self, config):
         self._namespace = config.scrapyd().get('namespace', 'default')
         self._pull_secret = config.scrapyd().get('pull_secret')
+        self._image_pull_secrets = [kubernetes.client.V1LocalObjectReference(s) for s in [self._pull_secret] if s]
+        self._termination_grace_period = int(config.scrapyd().get('termination_grace_period', 30))
+        self._ttl_seconds_after_finished = config.scrapyd().get('ttl_seconds_after_finished')
+        if self._ttl_seconds_after_finished is not None:
+            self._ttl_seconds_after_finished = int(self._ttl_seconds_after_finished)
+        self._node_name = ".".join(filter(None, [os.getenv('MY_NAMESPACE'), os.getenv('MY_DEPLOYMENT_NAME', 'default')]))
         # TODO figure out where to put Kubernetes initialisation
         try:
             kubernetes.config.load_incluster_config()
         except kubernetes.config.config_exception.ConfigException:
             kubernetes.config.load_kube_config()
 
-        self._k8s = kubernetes.client.CoreV1Api()
-        self._k8s_batch = kubernetes.client.BatchV1Api()
+        # share one connection pool, large enough for concurrent requests
+        k8s_config = kubernetes.client.Configuration.get_default_copy()
+        k8s_config.connection_pool_maxsize = max(32, (os.cpu_count() or 1) * 4)
+        self._api_client = kubernetes.client.ApiClient(k8s_config)
+        self._k8s = kubernetes.client.CoreV1Api(self._api_client)
+        self._k8s_batch = kubernetes.client.BatchV1Api(self._api_client)
+        # exec needs stream, which modifies client, so use a dedicated instance
+        self._k8s_exec = kubernetes.client.CoreV1Api(
+            kubernetes.client.ApiClient(kubernetes.client.Configuration.get_default_copy())
+        )
+        self._k8s_exec_lock = threading.Lock()
+        # parsed jobs by name, reused as long as their resource version is unchanged
+        self._parsed_jobs = {}
+        # container env sources and resources by project and spider, the configuration doesn't change
+        self._container_configs = {}
 
         self._init_resource_watcher(config)
 
     def _init_resource_watcher(self, config):
-        self.resource_watcher = ResourceWatcher(self._namespace, config)
+        # only watch pods of configured projects
+        projects = config.listprojects()
+        if projects:
+            label_selector = '%s in (%s)' % (self.LABEL_PROJECT, ','.join(projects))
+        else:
+            label_selector = self.LABEL_PROJECT
+        self.resource_watcher = ResourceWatcher(self._namespace, config, label_selector=label_selector, api_client=self._api_client)
+        # keep all scrapyd jobs at hand, so listing them doesn't need the API server
+        self.job_watcher = ResourceWatcher(self._namespace, config, label_selector=self.LABEL_PROJECT, resource='job', api_client=self._api_client)
 
         if config.joblogs() is not None:
             self.enable_joblogs(config)
@@ -40,20 +71,20 @@ class K8s:
             logger.debug("Job logs handling not enabled; 'joblogs' configuration section is missing.")
 
     def get_node_name(self):
-        deployment = os.getenv('MY_DEPLOYMENT_NAME', 'default')
-        namespace = os.getenv('MY_NAMESPACE')
-        return ".".join([n for n in [namespace, deployment] if n])
+        return self._node_name
 
     def listjobs(self, project=None):
-        label = self.LABEL_PROJECT + ('=%s'%(project) if project else '')
-        jobs = self._k8s_batch.list_namespaced_job(namespace=self._namespace, label_selector=label)
-        jobs = [self._parse_job(j) for j in jobs.items]
-        return jobs
+        jobs = self.job_watcher.get_objects()
+        if jobs is None:
+            # jobs not listed by the watcher yet, the API server's watch cache is recent enough
+            label = self.LABEL_PROJECT + ('=%s'%(project) if project else '')
+            jobs = self._k8s_batch.list_namespaced_job(namespace=self._namespace, label_selector=label, resource_version='0').items
+        elif project:
+            jobs = [j for j in jobs if j.metadata.labels.get(self.LABEL_PROJECT) == project]
+        return self._parse_jobs(jobs, project=project)
 
     def schedule(self, project, version, spider, job_id, settings, args):
         job_name = self._k8s_job_name(project.id(), job_id)
-        _settings = [i for k, v in native_stringify_dict(settings, keys_only=False).items() for i in ['-s', f"{k}={v}"]]
-        _args = [i for k, v in native_stringify_dict(args, keys_only=False).items() for i in ['-a', f"{k}={v}"]]
         env = {
             'SCRAPY_PROJECT': project.id(),
             'SCRAPYD_SPIDER': spider,
@@ -64,28 +95,14 @@ class K8s:
             self.LABEL_PROJECT: project.id(),
             self.LABEL_SPIDER: spider,
         }
-        env_from = []
-        env_config = project.env_config()
-        if env_config:
-            env_from.append(kubernetes.client.V1EnvFromSource(
-                config_map_ref=kubernetes.client.V1ConfigMapEnvSource(name=env_config, optional=False)
-            ))
-        env_secret = project.env_secret()
-        if env_secret:
-            env_from.append(kubernetes.client.V1EnvFromSource(
-                secret_ref=kubernetes.client.V1SecretEnvSource(name=env_secret, optional=False)
-            ))
-        resources = project.resources(spider)
+        env_from, resources = self._k8s_container_config(project, spider)
         container = kubernetes.client.V1Container(
             name=job_name,
             image=project.repository() + ':' + version,
-            args=['scrapy', 'crawl', spider, *_args, *_settings],
-            env=[kubernetes.client.V1EnvVar(k, v) for k, v in env.items()],
+            args=scrapy_crawl_args(spider, args, settings),
+            env=[{'name': k, 'value': v} for k, v in env.items()],
             env_from=env_from,
-            resources=kubernetes.client.V1ResourceRequirements(
-                requests=resources.get('requests', {}),
-                limits=resources.get('limits', {})
-            )
+            resources=resources
         )
         pod_template = kubernetes.client.V1PodTemplateSpec(
             metadata=kubernetes.client.V1ObjectMeta(name=job_name, labels=labels),
@@ -93,14 +110,16 @@ class K8s:
                 containers=[container],
                 share_process_namespace=True, # an init process for cancel
                 restart_policy='Never',
-                image_pull_secrets=[kubernetes.client.V1LocalObjectReference(s) for s in [self._pull_secret] if s]
+                termination_grace_period_seconds=self._termination_grace_period,
+                image_pull_secrets=self._image_pull_secrets
             )
         )
         job_spec = kubernetes.client.V1JobSpec(
             template=pod_template,
             # suspend=True, # TODO implement scheduler with suspend
             completions=1,
-            backoff_limit=0 # don't retry (TODO reconsider)
+            backoff_limit=0, # don't retry (TODO reconsider)
+            ttl_seconds_after_finished=self._ttl_seconds_after_finished
         )
         job = kubernetes.client.V1Job(
             api_version='batch/v1',
@@ -109,8 +128,14 @@ class K8s:
             spec=job_spec
         )
         r = self._k8s_batch.create_namespaced_job(namespace=self._namespace, body=job)
+        # list the job right away, without waiting for its watch event
+        self.job_watcher.add_object(r)
 
     def cancel(self, project, job_id, signal):
+        signum = _SIGNAL_MAP.get(signal)
+        if signum is None:
+            raise ValueError('Unknown signal: ' + str(signal))
+
         job = self._get_job(project, job_id)
         if not job:
             return None
@@ -122,7 +147,7 @@ class K8s:
             # kill pod (retry is disabled, so there should be only one pod)
             pod = self._get_pod(project, job_id)
             if pod: # if a pod has just ended, we're good already, don't kill
-                self._k8s_kill(pod.metadata.name, Signals['SIG' + signal].value)
+                self._k8s_kill(pod.metadata.name, signum)
         else:
             # not started yet, delete job
             self._k8s_batch.delete_namespaced_job(
@@ -133,77 +158,127 @@ class K8s:
                     grace_period_seconds=0
                 )
             )
+            self.job_watcher.remove_object(job.metadata.name)
         return prevstate
 
     def enable_joblogs(self, config):
         joblogs_config = config.joblogs()
         if joblogs_config and joblogs_config.get('storage_provider') is not None:
-            log_handler = KubernetesJobLogHandler(config)
+            log_handler = KubernetesJobLogHandler(config, api_client=self._api_client)
             self.resource_watcher.subscribe(log_handler.handle_events)
             logger.info("Job logs handler started.")
         else:
             logger.warning("No storage provider configured; job logs will not be uploaded.")
 
 
+    def _parse_jobs(self, jobs, project=None):
+        # entries of jobs that are no longer listed (for the project, when given) are dropped
+        cache, parsed = self._parsed_jobs, {}
+        for job in jobs:
+            name, resource_version = job.metadata.name, job.metadata.resource_version
+            entry = cache.get(name)
+            if entry is None or entry[0] != resource_version:
+                entry = (resource_version, self._parse_job(job))
+            parsed[name] = entry
+        result = [j for _, j in parsed.values()]
+        if project:
+            parsed.update((name, entry) for name, entry in cache.items()
+                          if name not in parsed and entry[1]['project'] != project)
+        self._parsed_jobs = parsed
+        return result
+
     def _parse_job(self, job):
         state = self._k8s_job_to_scrapyd_status(job)
+        labels, status = job.metadata.labels, job.status
         return {
-            'id': job.metadata.labels.get(self.LABEL_JOB_ID),
+            'id': labels.get(self.LABEL_JOB_ID),
             'state': state,
-            'project': job.metadata.labels.get(self.LABEL_PROJECT),
-            'spider': job.metadata.labels.get(self.LABEL_SPIDER),
-            'start_time': format_datetime_object(job.status.start_time) if state in ['running', 'finished'] else None,
-            'end_time': format_datetime_object(job.status.completion_time) if job.status.completion_time and state == 'finished' else None,
+            'project': labels.get(self.LABEL_PROJECT),
+            'spider': labels.get(self.LABEL_SPIDER),
+            'start_time': format_datetime_object(status.start_time) if state in ['running', 'finished'] else None,
+            'end_time': format_datetime_object(status.completion_time) if status.completion_time and state == 'finished' else None,
         }
 
     def _get_job(self, project, job_id):
-        label = self.LABEL_JOB_ID + '=' + job_id
-        r = self._k8s_batch.list_namespaced_job(namespace=self._namespace, label_selector=label)
+        job = self.job_watcher.get_object(self._k8s_job_name(project, job_id))
+        if job and self._k8s_is_job_object(job, project, job_id):
+            return job
+        # not seen by the watcher (yet)
+        r = self._k8s_batch.list_namespaced_job(namespace=self._namespace, label_selector=self._k8s_job_label_selector(project, job_id), limit=1)
         if not r or not r.items:
             return None
-        job = r.items[0]
-
-        if job.metadata.labels.get(self.LABEL_PROJECT) != project:
-            # TODO log error
-            return None
-
-        return job
+        return r.items[0]
 
     def _get_pod(self, project, job_id):
-        label = self.LABEL_JOB_ID + '=' + job_id
-        r = self._k8s.list_namespaced_pod(namespace=self._namespace, label_selector=label)
+        for pod in self.resource_watcher.get_objects() or []:
+            if self._k8s_is_job_object(pod, project, job_id):
+                return pod
+        # not seen by the watcher (yet)
+        r = self._k8s.list_namespaced_pod(namespace=self._namespace, label_selector=self._k8s_job_label_selector(project, job_id), limit=1)
         if not r or not r.items:
             return None
-        pod = r.items[0]
+        return r.items[0]
 
-        if pod.metadata.labels.get(self.LABEL_PROJECT) != project:
-            # TODO log error
-            return None
+    def _k8s_is_job_object(self, obj, project, job_id):
+        labels = obj.metadata.labels or {}
+        return labels.get(self.LABEL_JOB_ID) == job_id and labels.get(self.LABEL_PROJECT) == project
 
-        return pod
+    def _k8s_job_label_selector(self, project, job_id):
+        # selecting on project too makes the API server check ownership
+        return ','.join((self.LABEL_JOB_ID + '=' + job_id, self.LABEL_PROJECT + '=' + project))
 
     def _k8s_job_to_scrapyd_status(self, job):
-        if job.status.ready:
-            return 'running'
-        elif job.status.succeeded:
-            return 'finished'
-        elif job.status.failed:
+        status = job.status
+        if status.succeeded or status.failed:
             return 'finished'
+        elif status.ready:
+            return 'running'
         else:
             return 'pending'
 
+    def _k8s_container_config(self, project, spider):
+        key = (project.id(), spider)
+        if key not in self._container_configs:
+            env_from = []
+            env_config = project.env_config()
+            if env_config:
+                env_from.append(kubernetes.client.V1EnvFromSource(
+                    config_map_ref=kubernetes.client.V1ConfigMapEnvSource(name=env_config, optional=False)
+                ))
+            env_secret = project.env_secret()
+            if env_secret:
+                env_from.append(kubernetes.client.V1EnvFromSource(
+                    secret_ref=kubernetes.client.V1SecretEnvSource(name=env_secret, optional=False)
+                ))
+            resources = project.resources(spider)
+            self._container_configs[key] = (env_from, kubernetes.client.V1ResourceRequirements(
+                requests=resources.get('requests', {}),
+                limits=resources.get('limits', {})
+            ))
+        return self._container_configs[key]
+
     def _k8s_job_name(self, project, job_id):
         return '-'.join(('scrapyd', project, job_id))
 
     def _k8s_kill(self, pod_name, signal):
-        # exec needs stream, which modifies client, so use separate instance
-        k8s = kubernetes.client.CoreV1Api()
-        resp = kubernetes.stream.stream(
-            k8s.connect_get_namespaced_pod_exec,
-            pod_name,
-            namespace=self._namespace,
-            # this is a bit blunt, bit it works and is usually available
-            command=['/usr/sbin/killall5', '-' + str(signal)],
-            stderr=True
-        )
+        if signal in (Signals.SIGTERM.value, Signals.SIGINT.value, Signals.SIGKILL.value):
+            # deleting the pod makes the kubelet send SIGTERM, and SIGKILL after the grace period,
+            # which avoids an exec
+            self._k8s.delete_namespaced_pod(
+                name=pod_name,
+                namespace=self._namespace,
+                grace_period_seconds=0 if signal == Signals.SIGKILL.value else self._termination_grace_period,
+                propagation_policy='Background'
+            )
+            return
+        # other signals can only be sent from within the pod
+        with self._k8s_exec_lock:
+            resp = kubernetes.stream.stream(
+                self._k8s_exec.connect_get_namespaced_pod_exec,
+                pod_name,
+                namespace=self._namespace,
+                # this is a bit blunt, bit it works and is usually available
+                command=['/usr/sbin/killall5', '-' + str(signal)],
+                stderr=True
+            )
         # TODO figure out how to get return value
\ No newline at end of file
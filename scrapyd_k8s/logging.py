@@ -1,13 +1,37 @@
 import logging
 import sys
+import time
+
+LOG_FORMAT = '%(asctime)s %(name)s [%(levelname)s]: %(message)s'
+
+class CachedTimeFormatter(logging.Formatter):
+    """Formatter that formats the time of records only once per second."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._last = (None, None)
+
+    def formatTime(self, record, datefmt=None):
+        if datefmt:
+            return super().formatTime(record, datefmt)
+        second = int(record.created)
+        last_second, last_time = self._last
+        if second != last_second:
+            last_time = time.strftime(self.default_time_format, self.converter(second))
+            self._last = (second, last_time)
+        return self.default_msec_format % (last_time, record.msecs)
 
 def setup_logging(log_level):
     level_name = str(log_level).upper()
     numeric_level = logging.getLevelName(level_name)
     if not isinstance(numeric_level, int):
         raise ValueError(f"Invalid log_level '{log_level}'.")
+    if logging.getLogger().handlers:
+        # already set up, like basicConfig would leave it
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(CachedTimeFormatter(LOG_FORMAT))
     logging.basicConfig(
         level=numeric_level,
-        format='%(asctime)s %(name)s [%(levelname)s]: %(message)s',
-        handlers=[logging.StreamHandler(sys.stdout)]
+        handlers=[handler]
     )
@@ -25,8 +25,12 @@ class LibcloudObjectStorage:
         The storage provider name (e.g., 's3' for Amazon S3).
     _container_name : str
         The name of the container (bucket) in the storage provider.
+    _container : libcloud.storage.base.Container or None
+        The container, once it has been retrieved from the storage provider.
     VARIABLE_PATTERN : re.Pattern
         A compiled regular expression pattern for variable substitution.
+    STREAM_UPLOAD_THRESHOLD : int
+        File size (in bytes) from which files are uploaded as a stream, which allows multipart uploads.
 
     Methods
     -------
@@ -37,6 +41,7 @@ class LibcloudObjectStorage:
     """
 
     VARIABLE_PATTERN = re.compile(r'\$\{([^}]+)}')
+    STREAM_UPLOAD_THRESHOLD = 20 * 1024 * 1024
 
     def __init__(self, config):
         """
@@ -61,13 +66,14 @@ class LibcloudObjectStorage:
         if self._container_name is None:
             logger.error("Container name is not set in the configuration.")
             raise ValueError("Container name is not set")
+        self._container = None
 
         args_envs = config.joblogs_storage(self._storage_provider)
         args = {}
         for arg, value in args_envs.items():
             value_str = str(value)
             substituted_value = self._substitute_variables(value_str, arg)
-            logger.debug(f"Substituted value for '{arg}': {substituted_value}")
+            logger.debug("Substituted value for '%s'", arg)
             args[arg] = substituted_value
 
         driver_class = get_driver(self._storage_provider)
@@ -99,11 +105,14 @@ class LibcloudObjectStorage:
         ValueError
             If the required environment variable is not set.
         """
+        if '${' not in value:
+            return value
+
         def replace_var(match):
             env_var = match.group(1)
             env_value = os.getenv(env_var)
             if env_value is not None:
-                env_value = env_value.strip().strip('"').strip("'")
+                env_value = env_value.strip().strip('"\'')
                 return env_value
             else:
                 logger.error(f"Environment variable '{env_var}' is not set for argument '{arg_name}'.")
@@ -113,6 +122,19 @@ class LibcloudObjectStorage:
         result = result.replace(r'\${', '${')
         return result
 
+    def _get_container(self):
+        """
+        Returns the container, retrieving it from the storage provider only the first time.
+
+        Returns
+        -------
+        libcloud.storage.base.Container
+            The container to store objects in.
+        """
+        if self._container is None:
+            self._container = self.driver.get_container(container_name=self._container_name)
+        return self._container
+
     def upload_file(self, local_path):
         """
         Uploads a file to the object storage container.
@@ -130,17 +152,28 @@ class LibcloudObjectStorage:
         ----
         Logs information about the upload status or errors encountered.
         """
-        object_name = os.path.basename(local_path)
+        object_name = local_path.rpartition(os.sep)[2]
         try:
-            container = self.driver.get_container(container_name=self._container_name)
-            self.driver.upload_object(
-                local_path,
-                container,
-                object_name,
-                extra=None,
-                verify_hash=False,
-                headers=None
-            )
+            container = self._get_container()
+            if os.path.getsize(local_path) < self.STREAM_UPLOAD_THRESHOLD:
+                self.driver.upload_object(
+                    local_path,
+                    container,
+                    object_name,
+                    extra=None,
+                    verify_hash=False,
+                    headers=None
+                )
+            else:
+                # large files are streamed, which drivers like S3 upload in parts
+                with open(local_path, 'rb') as f:
+                    self.driver.upload_object_via_stream(
+                        iterator=f,
+                        container=container,
+                        object_name=object_name,
+                        extra={'content_type': 'text/plain'},
+                        headers=None
+                    )
             logger.info(f"Successfully uploaded '{object_name}' to container '{self._container_name}'.")
         except (ObjectError, ContainerDoesNotExistError, InvalidContainerNameError) as e:
             logger.exception(f"Error uploading the file '{object_name}': {e}")
@@ -165,9 +198,8 @@ class LibcloudObjectStorage:
         ----
         Logs information about the existence check or errors encountered.
         """
-        container = self.driver.get_container(container_name=self._container_name)
         try:
-            objects = self.driver.list_container_objects(container=container, prefix=prefix)
+            objects = self.driver.list_container_objects(container=self._get_container(), prefix=prefix)
             if objects:
                 logger.debug(f"At least one object with prefix '{prefix}' exists in container '{self._container_name}'.")
                 return True
@@ -1,26 +1,42 @@
 import docker
 
+from ..utils import TTLCache
+
 class Local:
 
     def __init__(self, config):
         self._docker = docker.from_env()
+        self._cache = TTLCache(config.scrapyd().getfloat('repository_cache_ttl', 30))
 
     def listtags(self, repo):
         """Returns available tags from local docker images"""
-        images = self._docker.images.list(repo)
-        tags = [i.tags[0].split(':')[-1] for i in images if i.tags]
         # TODO error handling
-        return tags
+        return list(self._images().get(repo, {}))
 
     def listspiders(self, repo, project, version):
         """Returns available spiders from a local docker image, or None on error."""
-        try:
-            image = self._docker.images.get(repo + ':' + version)
-            r = image.labels.get('org.scrapy.spiders')
-            if not r: return None
-            spiders = r.split(',')
-            spiders = [s.strip() for s in spiders]
-            return [s for s in spiders if s]
-        except docker.errors.ImageNotFound:
-            return None
+        labels = self._images().get(repo, {}).get(version)
+        if labels is None:
+            # the image may have been added after images were listed
+            try:
+                labels = self._docker.images.get(repo + ':' + version).labels
+            except docker.errors.ImageNotFound:
+                return None
+        r = labels.get('org.scrapy.spiders')
+        if not r: return None
+        spiders = r.split(',')
+        spiders = [s.strip() for s in spiders]
+        return [s for s in spiders if s]
+
+    def _images(self):
+        """Returns labels of local docker images by repository and tag."""
+        return self._cache.get('images', self._list_images)
 
+    def _list_images(self):
+        # a single summary listing includes tags and labels, without inspecting each image
+        images = {}
+        for image in self._docker.api.images():
+            for repo_tag in image.get('RepoTags') or []:
+                repo, _, tag = repo_tag.rpartition(':')
+                images.setdefault(repo, {})[tag] = image.get('Labels') or {}
+        return images
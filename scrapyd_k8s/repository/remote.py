@@ -1,19 +1,27 @@
 import json
 import subprocess
 
+from ..utils import TTLCache
+
 class Remote:
 
     def __init__(self, config):
-        pass
+        self._cache = TTLCache(config.scrapyd().getfloat('repository_cache_ttl', 30))
 
     def listtags(self, repo):
         """Returns available tags from a docker repository"""
+        return self._cache.get(('tags', repo), lambda: self._listtags(repo))
+
+    def listspiders(self, repo, project, version):
+        """Returns available spiders from a docker image, or None on error."""
+        return self._cache.get(('spiders', repo, version), lambda: self._listspiders(repo, project, version))
+
+    def _listtags(self, repo):
         r = json.loads(subprocess.check_output(['skopeo', 'list-tags', 'docker://' + repo]))
         # TODO error handling
         return r['Tags']
 
-    def listspiders(self, repo, project, version):
-        """Returns available spiders from a docker image, or None on error."""
+    def _listspiders(self, repo, project, version):
         r = subprocess.run(['skopeo', 'inspect', 'docker://' + repo + ':' + version], capture_output=True, text=True)
         if r.returncode != 0: return None
         j = json.loads(r.stdout)
@@ -15,24 +15,27 @@ MAX_WAIT = int(os.getenv('TEST_MAX_WAIT', '6'))
 STATIC_SLEEP = float(os.getenv('TEST_STATIC_SLEEP', '2'))
 WITH_K8S = bool(os.getenv('TEST_WITH_K8S'))
 
+# reuse connections to the server across requests
+session = requests.Session()
+
 def test_root_ok():
-    response = requests.get(BASE_URL)
+    response = session.get(BASE_URL)
     assert response.status_code == 200
     assert response.headers['Content-Type'] == 'text/html; charset=utf-8'
     assert 'scrapyd-k8s' in response.text
     assert '</html>' in response.text
 
 def test_healthz_ok():
-    response = requests.get(BASE_URL + '/healthz')
+    response = session.get(BASE_URL + '/healthz')
     assert response.status_code == 200
 
 def test_daemonstatus_ok():
-    response = requests.get(BASE_URL + '/daemonstatus.json')
+    response = session.get(BASE_URL + '/daemonstatus.json')
     assert_response_ok(response)
     # TODO assert response.json() == { 'status': 'ok', ... }
 
 def test_listprojects_ok():
-    response = requests.get(BASE_URL + '/listprojects.json')
+    response = session.get(BASE_URL + '/listprojects.json')
     assert_response_ok(response)
 
     json = response.json()
@@ -40,7 +43,7 @@ def test_listprojects_ok():
     assert 'node_name' in json
 
 def test_listversions_ok():
-    response = requests.get(BASE_URL + '/listversions.json?project=' + RUN_PROJECT)
+    response = session.get(BASE_URL + '/listversions.json?project=' + RUN_PROJECT)
     assert_response_ok(response)
 
     json = response.json()
@@ -48,15 +51,15 @@ def test_listversions_ok():
     assert 'node_name' in json
 
 def test_listversions_project_missing():
-    response = requests.get(BASE_URL + '/listversions.json')
+    response = session.get(BASE_URL + '/listversions.json')
     assert_response_error(response, 400)
 
 def test_listversions_project_not_found():
-    response = requests.get(BASE_URL + '/listversions.json?project=' + 'nonexistant')
+    response = session.get(BASE_URL + '/listversions.json?project=' + 'nonexistant')
     assert_response_error(response, 404)
 
 def test_listspiders_ok():
-    response = requests.get(BASE_URL + '/listspiders.json?project=' + RUN_PROJECT + '&_version=' + RUN_VERSION)
+    response = session.get(BASE_URL + '/listspiders.json?project=' + RUN_PROJECT + '&_version=' + RUN_VERSION)
     assert_response_ok(response)
 
     json = response.json()
@@ -64,7 +67,7 @@ def test_listspiders_ok():
     assert 'node_name' in json
 
 def test_listspiders_ok_without_version():
-    response = requests.get(BASE_URL + '/listspiders.json?project=' + RUN_PROJECT)
+    response = session.get(BASE_URL + '/listspiders.json?project=' + RUN_PROJECT)
     assert_response_ok(response)
 
     json = response.json()
@@ -72,55 +75,58 @@ def test_listspiders_ok_without_version():
     assert 'node_name' in json
 
 def test_listspiders_project_missing():
-    response = requests.get(BASE_URL + '/listspiders.json')
+    response = session.get(BASE_URL + '/listspiders.json')
     assert_response_error(response, 400)
 
 def test_listspiders_project_not_found():
-    response = requests.get(BASE_URL + '/listspiders.json?project=' + 'nonexistant' + '&_version=' + RUN_VERSION)
+    response = session.get(BASE_URL + '/listspiders.json?project=' + 'nonexistant' + '&_version=' + RUN_VERSION)
     assert_response_error(response, 404)
 
 def test_listspiders_version_not_found():
-    response = requests.get(BASE_URL + '/listspiders.json?project=' + RUN_PROJECT + '&_version=' + 'nonexistant')
+    response = session.get(BASE_URL + '/listspiders.json?project=' + RUN_PROJECT + '&_version=' + 'nonexistant')
     assert_response_error(response, 404)
 
 def test_addversion():
-    response = requests.post(BASE_URL + '/addversion.json')
+    response = session.post(BASE_URL + '/addversion.json')
     assert_response_error(response, 501)
 
 def test_delversion():
-    response = requests.post(BASE_URL + '/delversion.json')
+    response = session.post(BASE_URL + '/delversion.json')
     assert_response_error(response, 501)
 
 def test_delproject():
-    response = requests.post(BASE_URL + '/delproject.json')
+    response = session.post(BASE_URL + '/delproject.json')
     assert_response_error(response, 501)
 
 def test_schedule_project_missing():
-    response = requests.post(BASE_URL + '/schedule.json', data={})
+    response = session.post(BASE_URL + '/schedule.json', data={})
     assert_response_error(response, 400)
 
 def test_schedule_project_not_found():
-    response = requests.post(BASE_URL + '/schedule.json', data={ 'project': 'nonexistant' })
+    response = session.post(BASE_URL + '/schedule.json', data={ 'project': 'nonexistant' })
     assert_response_error(response, 400)
 
 def test_schedule_spider_missing():
-    response = requests.post(BASE_URL + '/schedule.json', data={ 'project': RUN_PROJECT })
+    response = session.post(BASE_URL + '/schedule.json', data={ 'project': RUN_PROJECT })
     assert_response_error(response, 400)
 
 # scheduling a non-existing spider will try to start it, so no error
 # scheduling a non-existing project version will try to start it, so no error
 
 def test_cancel_project_missing():
-    response = requests.post(BASE_URL + '/cancel.json', data={})
+    response = session.post(BASE_URL + '/cancel.json', data={})
     assert_response_error(response, 400)
 
 # we don't test cancelling a spider from a project not in the config file
 
 def test_cancel_jobid_missing():
-    response = requests.post(BASE_URL + '/cancel.json', data={ 'project': RUN_PROJECT })
+    response = session.post(BASE_URL + '/cancel.json', data={ 'project': RUN_PROJECT })
+    assert_response_error(response, 400)
+
+def test_cancel_signal_invalid():
+    response = session.post(BASE_URL + '/cancel.json', data={ 'project': RUN_PROJECT, 'job': 'nonexistant', 'signal': 'NONEXISTANT' })
     assert_response_error(response, 400)
 
-# TODO test cancel with invalid signal (currently returns server error, could be improved)
 def test_scenario_regular_ok():
     scenario_regular({
         'project': RUN_PROJECT, '_version': RUN_VERSION, 'spider': RUN_SPIDER,
@@ -137,7 +143,7 @@ def test_scenario_regular_ok_without_version():
 def test_scenario_cancel_running_finished_ok():
     assert_listjobs()
     # schedule a new job and wait until it is running
-    response = requests.post(BASE_URL + '/schedule.json', data={
+    response = session.post(BASE_URL + '/schedule.json', data={
         'project': RUN_PROJECT, '_version': RUN_VERSION, 'spider': RUN_SPIDER,
         'setting': 'STATIC_SLEEP=%d' % (STATIC_SLEEP * 5)
     })
@@ -147,7 +153,7 @@ def test_scenario_cancel_running_finished_ok():
     # wait until the job is running
     listjobs_wait(jobid, 'running')
     # cancel the job, with the kill signal to make it stop right away
-    response = requests.post(BASE_URL + '/cancel.json', data={
+    response = session.post(BASE_URL + '/cancel.json', data={
         'project': RUN_PROJECT, 'job': jobid, 'signal': 'KILL'
     })
     assert_response_ok(response)
@@ -164,17 +170,44 @@ def test_scenario_cancel_running_finished_ok():
     assert end_time is None
     assert jobinfo == { 'id': jobid, 'project': RUN_PROJECT, 'spider': RUN_SPIDER, 'state': 'finished' }
     # then cancel it again, though nothing would happen
-    response = requests.post(BASE_URL + '/cancel.json', data={ 'project': RUN_PROJECT, 'job': jobid })
+    response = session.post(BASE_URL + '/cancel.json', data={ 'project': RUN_PROJECT, 'job': jobid })
     assert_response_ok(response)
 
     json = response.json()
     assert json['prevstate'] == 'finished'
     assert 'node_name' in json
 
+def test_scenario_cancel_running_term_ok():
+    assert_listjobs()
+    # schedule a new job and wait until it is running
+    response = session.post(BASE_URL + '/schedule.json', data={
+        'project': RUN_PROJECT, '_version': RUN_VERSION, 'spider': RUN_SPIDER,
+        'setting': 'STATIC_SLEEP=%d' % (STATIC_SLEEP * 5)
+    })
+    assert_response_ok(response)
+    jobid = response.json()['jobid']
+    assert jobid is not None
+    listjobs_wait(jobid, 'running')
+    # cancel the job with the default signal, which lets it shut down gracefully
+    response = session.post(BASE_URL + '/cancel.json', data={ 'project': RUN_PROJECT, 'job': jobid })
+    assert_response_ok(response)
+
+    json = response.json()
+    assert json['prevstate'] == 'running'
+    assert 'node_name' in json
+
+    # shutting down may take until the spider is done sleeping
+    listjobs_wait(jobid, 'finished', max_wait=MAX_WAIT + STATIC_SLEEP * 5)
+    jobinfo = assert_listjobs(finished=jobid)
+    start_time = jobinfo.pop('start_time')
+    jobinfo.pop('end_time')
+    assert datetime.strptime(start_time, '%Y-%m-%d %H:%M:%S.%f')
+    assert jobinfo == { 'id': jobid, 'project': RUN_PROJECT, 'spider': RUN_SPIDER, 'state': 'finished' }
+
 def scenario_regular(schedule_args):
     assert_listjobs()
     # schedule a job
-    response = requests.post(BASE_URL + '/schedule.json', data=schedule_args)
+    response = session.post(BASE_URL + '/schedule.json', data=schedule_args)
     assert_response_ok(response)
     jobid = response.json()['jobid']
     assert jobid is not None
@@ -206,33 +239,37 @@ def assert_response_error(response, status):
     assert response.json()['message'] is not None
 
 def assert_listjobs(pending=None, running=None, finished=None):
-    response = requests.get(BASE_URL + '/listjobs.json')
+    response = session.get(BASE_URL + '/listjobs.json')
     assert_response_ok(response)
+    data = response.json()
     if pending:
-        assert len(response.json()['pending']) == 1
-        assert response.json()['pending'][0]['id'] == pending
-        return response.json()['pending'][0]
+        assert len(data['pending']) == 1
+        assert data['pending'][0]['id'] == pending
+        return data['pending'][0]
     else:
-        assert response.json()['pending'] == []
+        assert data['pending'] == []
     if running:
-        assert len(response.json()['running']) == 1
-        assert response.json()['running'][0]['id'] == running
-        return response.json()['running'][0]
+        assert len(data['running']) == 1
+        assert data['running'][0]['id'] == running
+        return data['running'][0]
     else:
-        assert response.json()['running'] == []
+        assert data['running'] == []
     # finished may contain other jobs
     if finished:
-        matches = [j for j in response.json()['finished'] if j['id'] == finished]
+        matches = [j for j in data['finished'] if j['id'] == finished]
         assert len(matches) == 1
         return matches[0]
 
-def listjobs_wait(jobid, state):
+def listjobs_wait(jobid, state, max_wait=MAX_WAIT):
     started = time.monotonic()
-    while time.monotonic() - started < MAX_WAIT:
-        response = requests.get(BASE_URL + '/listjobs.json')
+    # poll often at first, then back off for slower state changes
+    delay = 0.05
+    while time.monotonic() - started < max_wait:
+        response = session.get(BASE_URL + '/listjobs.json')
         assert_response_ok(response)
         for j in response.json()[state]:
             if j['id'] == jobid:
                 return True
-        time.sleep(0.5)
+        time.sleep(delay)
+        delay = min(delay * 1.7, 1.0)
     assert False, 'Timeout waiting for job state change'
@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+from unittest.mock import Mock
+import pytest
+from kubernetes import client
+from scrapyd_k8s import k8s_resource_watcher
+from scrapyd_k8s.k8s_resource_watcher import ResourceWatcher
+
+watch_resources = ResourceWatcher.watch_resources
+
+def make_obj(name, resource_version='1', deletion_timestamp=None):
+    return SimpleNamespace(metadata=SimpleNamespace(
+        name=name, resource_version=resource_version, deletion_timestamp=deletion_timestamp
+    ))
+
+def make_list_func(*objs):
+    return lambda **kwargs: SimpleNamespace(items=list(objs), metadata=SimpleNamespace(resource_version='10'))
+
+@pytest.fixture
+def watcher(monkeypatch):
+    # don't start watching the Kubernetes API
+    monkeypatch.setattr(ResourceWatcher, 'watch_resources', lambda self: None)
+    config = Mock()
+    config.scrapyd.return_value = {}
+    return ResourceWatcher('default', config, resource='job')
+
+def test_unsynced(watcher):
+    assert watcher.get_objects() is None
+    assert watcher.get_object('a') is None
+
+def test_resync(watcher):
+    events = []
+    watcher.subscribe(events.append)
+    resource_version = watcher._resync(make_list_func(make_obj('a'), make_obj('b', deletion_timestamp='now')), {})
+    assert resource_version == '10'
+    assert [o.metadata.name for o in watcher.get_objects()] == ['a']
+    assert [(e['type'], e['object'].metadata.name) for e in events] == [('ADDED', 'a'), ('ADDED', 'b')]
+
+def test_update_store(watcher):
+    watcher._resync(make_list_func(), {})
+    watcher._update_store('ADDED', make_obj('a'))
+    watcher._update_store('MODIFIED', make_obj('a', '2'))
+    assert watcher.get_object('a').metadata.resource_version == '2'
+    # a job being deleted is not listed anymore
+    watcher._update_store('MODIFIED', make_obj('a', '3', deletion_timestamp='now'))
+    assert watcher.get_object('a') is None
+    watcher._update_store('ADDED', make_obj('b'))
+    watcher._update_store('DELETED', make_obj('b'))
+    assert watcher.get_objects() == []
+
+def test_add_and_remove_object(watcher):
+    watcher._resync(make_list_func(make_obj('a', '2')), {})
+    watcher.add_object(make_obj('a', '1'))
+    assert watcher.get_object('a').metadata.resource_version == '2'
+    watcher.add_object(make_obj('b'))
+    assert watcher.get_object('b') is not None
+    watcher.remove_object('b')
+    assert watcher.get_object('b') is None
+
+def test_watch_failure_unsyncs(watcher, monkeypatch):
+    def stream(func, **kwargs):
+        # listed fine, but watching is not allowed
+        assert watcher.get_object('a') is not None
+        watcher._stop_event.set()
+        raise client.ApiException(status=403)
+    monkeypatch.setattr(client, 'BatchV1Api', lambda api_client: SimpleNamespace(list_namespaced_job=make_list_func(make_obj('a'))))
+    monkeypatch.setattr(k8s_resource_watcher.watch, 'Watch', lambda: SimpleNamespace(stream=stream))
+    monkeypatch.setattr(k8s_resource_watcher.time, 'sleep', lambda seconds: None)
+    watch_resources(watcher)
+    # readers fall back to the API until the watcher has listed again
+    assert watcher.get_objects() is None
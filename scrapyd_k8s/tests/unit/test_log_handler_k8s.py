@@ -0,0 +1,67 @@
+import pytest
+from unittest.mock import Mock
+from scrapyd_k8s.joblogs import log_handler_k8s
+from scrapyd_k8s.joblogs.log_handler_k8s import KubernetesJobLogHandler, _sortable_timestamp
+
+
+class FakeWatch:
+    """Stands in for kubernetes.watch.Watch, streaming the given log lines."""
+    def __init__(self, lines):
+        self.lines = lines
+        self.kwargs = None
+
+    def stream(self, func, **kwargs):
+        self.kwargs = kwargs
+        return iter(self.lines)
+
+@pytest.fixture
+def handler(tmp_path):
+    # only what stream_logs needs, without connecting to Kubernetes or object storage
+    handler = KubernetesJobLogHandler.__new__(KubernetesJobLogHandler)
+    handler.logs_dir = str(tmp_path)
+    handler.namespace = 'default'
+    handler.last_log_timestamps = {}
+    handler._v1 = Mock()
+    return handler
+
+def stream(handler, monkeypatch, lines):
+    fake_watch = FakeWatch(lines)
+    monkeypatch.setattr(log_handler_k8s.watch, 'Watch', lambda: fake_watch)
+    handler.stream_logs('job1', 'pod1')
+    with open(handler.make_log_filename_for_job('job1'), 'rb') as f:
+        return f.read(), fake_watch.kwargs
+
+LINES = [
+    '2024-08-30T13:45:30.1Z first',
+    '2024-08-30T13:45:30.25Z second line',
+    '2024-08-30T13:45:31Z third',
+]
+
+def test_stream_logs_fresh(handler, monkeypatch):
+    data, kwargs = stream(handler, monkeypatch, LINES)
+    assert data == b'first\nsecond line\nthird\n'
+    assert 'since_seconds' not in kwargs
+    assert handler.last_log_timestamps['job1'] == '2024-08-30T13:45:31.000000000Z'
+
+def test_stream_logs_resume_by_offset(handler, monkeypatch):
+    # after a restart, the log file was cut in the middle of a line
+    with open(handler.make_log_filename_for_job('job1'), 'wb') as f:
+        f.write(b'first\nsec')
+    data, kwargs = stream(handler, monkeypatch, LINES)
+    assert data == b'first\nsecond line\nthird\n'
+    assert 'since_seconds' not in kwargs
+
+def test_stream_logs_resume_by_timestamp(handler, monkeypatch):
+    with open(handler.make_log_filename_for_job('job1'), 'wb') as f:
+        f.write(b'first\nsecond line\n')
+    handler.last_log_timestamps['job1'] = _sortable_timestamp(LINES[1].split(' ')[0])
+    # the API returns lines from the start of the second, including ones already written
+    data, kwargs = stream(handler, monkeypatch, LINES)
+    assert data == b'first\nsecond line\nthird\n'
+    assert kwargs['since_seconds'] >= 1
+
+def test_sortable_timestamp():
+    assert _sortable_timestamp('2024-08-30T13:45:30Z') == '2024-08-30T13:45:30.000000000Z'
+    assert _sortable_timestamp('2024-08-30T13:45:30.12Z') == '2024-08-30T13:45:30.120000000Z'
+    assert _sortable_timestamp('2024-08-30T13:45:30.123456789Z') == '2024-08-30T13:45:30.123456789Z'
+    assert _sortable_timestamp('2024-08-30T13:45:30.12Z') < _sortable_timestamp('2024-08-30T13:45:30.2Z')
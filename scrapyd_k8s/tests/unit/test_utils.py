@@ -1,6 +1,9 @@
 from datetime import datetime
+import time
 import pytest
-from scrapyd_k8s.utils import format_datetime_object, format_iso_date_string
+from scrapyd_k8s.utils import (
+    TTLCache, format_datetime_object, format_iso_date_string, native_stringify_dict, scrapy_crawl_args
+)
 
 
 def test_format_iso_date_string():
@@ -16,3 +19,54 @@ def test_format_datetime_object():
     input_datetime = datetime(2024, 8, 30, 13, 45, 30, 123456)
     expected = "2024-08-30 13:45:30.123456"
     assert format_datetime_object(input_datetime) == expected
+
+def test_native_stringify_dict():
+    dct = {'a': b'1'}
+    result = native_stringify_dict(dct)
+    assert result == dct and result is not dct
+    assert native_stringify_dict({b'a': b'1'}) == {'a': b'1'}
+    assert native_stringify_dict({b'a': {b'b': [b'1']}}, keys_only=False) == {'a': {'b': ['1']}}
+
+def test_scrapy_crawl_args():
+    args = scrapy_crawl_args('quotes', {'a': '1', 'b': '2'}, {'SETTING': 'x=y'})
+    assert args == ['scrapy', 'crawl', 'quotes', '-a', 'a=1', '-a', 'b=2', '-s', 'SETTING=x=y']
+
+def test_scrapy_crawl_args_bytes():
+    args = scrapy_crawl_args('quotes', {b'a': b'1'}, {})
+    assert args == ['scrapy', 'crawl', 'quotes', '-a', 'a=1']
+
+def test_ttl_cache():
+    cache = TTLCache(60)
+    calls = []
+    def func():
+        calls.append(1)
+        return ['latest']
+    assert cache.get('repo', func) == ['latest']
+    assert cache.get('repo', func) == ['latest']
+    assert len(calls) == 1
+    cache.clear()
+    cache.get('repo', func)
+    assert len(calls) == 2
+
+def test_ttl_cache_disabled_or_none():
+    assert TTLCache(0).get('repo', lambda: 'a') == 'a'
+    cache = TTLCache(60)
+    assert cache.get('repo', lambda: None) is None
+    assert cache.get('repo', lambda: 'b') == 'b'
+
+def test_ttl_cache_max_entries():
+    cache = TTLCache(60)
+    cache.MAX_ENTRIES = 2
+    for key in ('a', 'b', 'c'):
+        cache.get(key, lambda: key)
+    assert cache.get('a', lambda: 'new') == 'new'
+    assert cache.get('c', lambda: 'new') == 'c'
+
+def test_ttl_cache_max_entries_expired():
+    cache = TTLCache(0.05)
+    cache.MAX_ENTRIES = 3
+    for key in ('a', 'b', 'c'):
+        cache.get(key, lambda: key)
+    time.sleep(0.06)
+    assert cache.get('d', lambda: 'd') == 'd'
+    assert cache.get('d', lambda: 'new') == 'd'
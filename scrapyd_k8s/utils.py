@@ -1,12 +1,13 @@
+import threading
+import time
 from datetime import datetime
+from itertools import islice
 
 
-TIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
-
 def _to_native_str(text, encoding="utf-8", errors="strict"):
     if isinstance(text, str):
         return text
-    if not isinstance(text, (bytes, str)):
+    if not isinstance(text, bytes):
         raise TypeError(
             "_to_native_str must receive a bytes, str or unicode "
             "object, got %s" % type(text).__name__
@@ -19,6 +20,8 @@ def native_stringify_dict(dct_or_tuples, encoding="utf-8", keys_only=True):
     False) of the given dict converted to strings. `dct_or_tuples` can be a
     dict or a list of tuples, like any dict constructor supports.
     """
+    if keys_only and all(type(k) is str for k in dct_or_tuples):
+        return dict(dct_or_tuples)
     d = {}
     for k, v in dct_or_tuples.items():
         k = _to_native_str(k, encoding)
@@ -32,8 +35,64 @@ def native_stringify_dict(dct_or_tuples, encoding="utf-8", keys_only=True):
         d[k] = v
     return d
 
+def scrapy_crawl_args(spider, args, settings):
+    """Return the scrapy command to crawl `spider` with spider arguments `args`
+    and scrapy `settings`, converting them to strings only when needed.
+    """
+    cmd = ['scrapy', 'crawl', spider]
+    for option, dct in (('-a', args), ('-s', settings)):
+        if not all(isinstance(k, str) and isinstance(v, str) for k, v in dct.items()):
+            dct = native_stringify_dict(dct, keys_only=False)
+        for k, v in dct.items():
+            cmd += (option, f"{k}={v}")
+    return cmd
+
 def format_iso_date_string(date_string):
-    return datetime.fromisoformat(date_string).strftime(TIME_FORMAT)
+    return format_datetime_object(datetime.fromisoformat(date_string))
 
 def format_datetime_object(datetime_obj):
-    return datetime_obj.strftime(TIME_FORMAT)
+    # like strftime('%Y-%m-%d %H:%M:%S.%f'), without parsing a format string
+    return datetime_obj.replace(tzinfo=None).isoformat(' ', 'microseconds')
+
+class TTLCache:
+    """Cache of values that expire `ttl` seconds after they were obtained.
+    A `ttl` of zero or less disables caching. At most `MAX_ENTRIES` values are
+    kept, the oldest ones are dropped first.
+    """
+    MAX_ENTRIES = 1024
+
+    def __init__(self, ttl):
+        self._ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, func):
+        """Return the value cached for `key`, calling `func` to obtain it when
+        absent or expired. A `None` result is not cached.
+        """
+        if self._ttl <= 0:
+            return func()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        value = func()
+        if value is not None:
+            with self._lock:
+                # entries are kept in the order they were stored, oldest first
+                self._entries.pop(key, None)
+                if len(self._entries) >= self.MAX_ENTRIES:
+                    self._entries = {k: e for k, e in self._entries.items() if e[0] > now}
+                    # still full of unexpired entries
+                    excess = len(self._entries) - self.MAX_ENTRIES + 1
+                    if excess > 0:
+                        for k in list(islice(self._entries, excess)):
+                            del self._entries[k]
+                self._entries[key] = (now + self._ttl, value)
+        return value
+
+    def clear(self):
+        """Remove all cached values."""
+        with self._lock:
+            self._entries.clear()